@@ -2,18 +2,32 @@
 # Telegram Football Sign-Up Bot
 # - 15 slots + waitlist (5) + VIP auto-reservations
 # - Inline buttons: Join / Leave / List
-# - Admin commands: /newgame, /lock, /unlock, /reset
-# - Persistence: Pickle file (no database needed)
+# - Admin commands: /newgame, /lock, /unlock, /reset, /flush (+ /refreshadmins)
+# - Persistence: zlib-compressed JSON file (no database needed), flushed periodically
+# - Updates via webhook when WEBHOOK_URL is set (Procfile `web`), long polling
+#   otherwise (Procfile `worker`)
 # - Python 3.10+, python-telegram-bot==20.8
 
 from __future__ import annotations
 
 import os
+import re
+import copy
 import html
+import time
+import zlib
+import pickle
+import secrets
+import asyncio
 import logging
-from datetime import datetime, timezone
-from typing import List, Dict, Any
-
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Deque, Optional
+
+import orjson
+from cachetools import LRUCache, TTLCache
 from dateutil import parser as dtparser
 from telegram import (
     Update,
@@ -24,13 +38,15 @@ from telegram import (
     ChatMemberOwner,
 )
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
+    BasePersistence,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     MessageHandler,
-    PicklePersistence,
+    PersistenceInput,
     filters,
 )
 
@@ -45,8 +61,26 @@ WAITLIST_CAPACITY = 5  # <= your request
 # Make sure they match how the names appear in Telegram (e.g., "Albert Tan" if that’s the display)
 VIP_NAMES = ["Albert", "Ah Soon"]
 
+# File holding chat_data as zlib-compressed JSON. Writes are batched: the file is
+# rewritten at most every PERSISTENCE_INTERVAL seconds and on shutdown (or via /flush).
+PERSISTENCE_FILE = "bot.json.zlib"
+PERSISTENCE_INTERVAL = 60
+# Pickle written by earlier versions; imported once if PERSISTENCE_FILE is missing.
+LEGACY_PICKLE_FILE = "bot.pkl"
+
 # If you later want to bind VIPs to real Telegram accounts, you can extend each row with a user_id.
 
+# Upper bound on chats kept in the in-memory per-chat caches (roster HTML, locks).
+CHAT_CACHE_SIZE = 4096
+
+# How long (seconds) an admin check result is reused before asking Telegram again.
+# /refreshadmins clears it for a chat right away.
+ADMIN_CACHE_TTL = 300
+
+# After a join/leave/lock, wait this long (seconds) for more taps before refreshing
+# the chat's roster message, so a burst of joins costs one edit, not one each.
+ROSTER_DEBOUNCE = 0.25
+
 
 # -----------------------------
 # Logging
@@ -65,24 +99,54 @@ def is_admin(member: ChatMember) -> bool:
     return isinstance(member, (ChatMemberAdministrator, ChatMemberOwner))
 
 
+# (chat_id, user_id) -> is admin. Admin sets change rarely, so skip the
+# get_chat_member round-trip for repeated admin commands.
+_admin_cache: TTLCache[tuple[int, int], bool] = TTLCache(
+    maxsize=CHAT_CACHE_SIZE, ttl=ADMIN_CACHE_TTL
+)
+
+
 async def user_is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     chat = update.effective_chat
     user = update.effective_user
     if not chat or not user:
         return False
+    key = (chat.id, user.id)
+    cached = _admin_cache.get(key)
+    if cached is not None:
+        return cached
     try:
         member = await context.bot.get_chat_member(chat.id, user.id)
-        return is_admin(member)
     except Exception as e:
+        # Not cached: a transient failure shouldn't lock admins out for minutes.
         logger.warning("Admin check failed: %s", e)
         return False
+    result = _admin_cache[key] = is_admin(member)
+    return result
+
 
+def forget_admins(chat_id: int) -> None:
+    for key in [k for k in _admin_cache if k[0] == chat_id]:
+        _admin_cache.pop(key, None)
 
-def now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
 
+def now_ts() -> float:
+    # Plain epoch seconds: timestamps are only stored, never shown, so skip
+    # building a timezone-aware datetime on every join.
+    return time.time()
 
-def make_keyboard(locked: bool) -> InlineKeyboardMarkup:
+
+def _as_ts(value: Any) -> float:
+    """Read a stored timestamp; events saved by older versions hold ISO strings."""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return 0.0
+    return float(value or 0.0)
+
+
+def _build_keyboard(locked: bool) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text="✅ Join", callback_data="join")],
         [InlineKeyboardButton(text="🚪 Leave", callback_data="leave")],
@@ -93,35 +157,130 @@ def make_keyboard(locked: bool) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-def ensure_event(chat_data: Dict[str, Any]) -> Dict[str, Any]:
-    if "event" not in chat_data or not chat_data.get("event"):
-        chat_data["event"] = {
-            "title": None,  # e.g., "Sat 5 Oct, 7pm"
-            "capacity": DEFAULT_CAPACITY,
-            "locked": False,
-            "players": [],   # list of dicts: {user_id, name, joined_at, is_vip}
-            "waitlist": [],  # same structure
-            "created_at": now_iso(),
-        }
-    return chat_data["event"]
+# Only two keyboard shapes exist; build and serialize them once. PTB hands str
+# parameters to the Bot API verbatim, so passing the JSON as reply_markup skips
+# the to_dict()/json.dumps walk over every button on each send. (This bypasses
+# ExtBot's callback-data cache, which the bot does not use.)
+_KB_OPEN = _build_keyboard(False).to_json()
+_KB_LOCKED = _build_keyboard(True).to_json()
+
+
+def make_keyboard(locked: bool) -> str:
+    """Return the serialized reply_markup for the Join/Leave/List keyboard."""
+    return _KB_LOCKED if locked else _KB_OPEN
+
+
+# -----------------------------
+# State
+# -----------------------------
+@dataclass(slots=True)
+class PlayerRow:
+    user_id: int | None  # None means it's a reserved slot by name (VIP)
+    name: str
+    joined_at: float  # epoch seconds
+    is_vip: bool = False
+    name_html: str = ""  # html.escape(name), computed once at insert time
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any]) -> PlayerRow:
+        return cls(
+            user_id=row.get("user_id"),
+            name=row["name"],
+            joined_at=_as_ts(row.get("joined_at")),
+            is_vip=bool(row.get("is_vip")),
+            name_html=row.get("name_html") or html.escape(row["name"]),
+        )
+
+    def __reduce__(self) -> tuple:
+        # Rebuild from positional fields: cheaper than the default slots state
+        # for copy.deepcopy (PTB deep-copies chat_data on every persistence
+        # update) and for pickling.
+        return (PlayerRow, tuple(getattr(self, f) for f in self.__slots__))
+
+
+def _new_waitlist(rows: Any = ()) -> Deque[PlayerRow]:
+    # Bounded deque: O(1) popleft when promoting, and maxlen documents the cap.
+    return deque(rows, maxlen=WAITLIST_CAPACITY)
+
+
+@dataclass(slots=True)
+class EventState:
+    title: str | None = None  # e.g., "Sat 5 Oct, 7pm"
+    title_html: str | None = None  # html.escape(title), computed once in newgame
+    capacity: int = DEFAULT_CAPACITY
+    locked: bool = False
+    players: List[PlayerRow] = field(default_factory=list)
+    waitlist: Deque[PlayerRow] = field(default_factory=_new_waitlist)
+    index: Dict[int, tuple[str, int]] = field(default_factory=dict)  # user_id -> (list name, position)
+    version: int = 0  # bumped on every mutation; keys the roster cache
+    roster_msg_id: int | None = None  # latest roster message the bot sent
+    roster_msg_version: int | None = None  # event version shown in that message
+    created_at: float = field(default_factory=now_ts)  # epoch seconds
+
+    @classmethod
+    def from_dict(cls, event: Dict[str, Any]) -> EventState:
+        """Convert an event pickled as a plain dict by older versions of the bot."""
+        title = event.get("title")
+        state = cls(
+            title=title,
+            title_html=event.get("title_html") or (html.escape(title) if title else None),
+            capacity=event.get("capacity", DEFAULT_CAPACITY),
+            locked=bool(event.get("locked")),
+            players=[PlayerRow.from_dict(r) for r in event.get("players", [])],
+            waitlist=_new_waitlist(PlayerRow.from_dict(r) for r in event.get("waitlist", [])),
+            version=event.get("version", 0),
+            roster_msg_id=event.get("roster_msg_id"),
+            roster_msg_version=event.get("roster_msg_version"),
+            created_at=_as_ts(event.get("created_at")) or now_ts(),
+        )
+        rebuild_index(state)
+        return state
+
+    def __reduce__(self) -> tuple:
+        # See PlayerRow.__reduce__.
+        return (EventState, tuple(getattr(self, f) for f in self.__slots__))
 
 
-def find_user(lst: List[Dict[str, Any]], user_id: int) -> int:
-    for i, row in enumerate(lst):
-        if row.get("user_id") == user_id:
-            return i
-    return -1
+def ensure_event(chat_data: Dict[str, Any]) -> EventState:
+    event = chat_data.get("event")
+    if not event:
+        event = chat_data["event"] = EventState()
+    elif isinstance(event, dict):
+        # Legacy pickles store the event as a dict: migrate on first access.
+        event = chat_data["event"] = EventState.from_dict(event)
+    return event
 
 
-def format_roster(event: Dict[str, Any]) -> str:
-    title = event.get("title") or "Upcoming Game"
-    cap = event.get("capacity", DEFAULT_CAPACITY)
-    players = event.get("players", [])
-    wait = event.get("waitlist", [])
+def bump_version(event: EventState) -> None:
+    event.version += 1
+
+
+def rebuild_index(event: EventState, key: str | None = None, start: int = 0) -> None:
+    """(Re)build event.index for `key` from position `start` (all lists if key is None)."""
+    if key is None:
+        event.index = {}
+        keys = ("players", "waitlist")
+    else:
+        keys = (key,)
+    index = event.index
+    for k in keys:
+        lst = getattr(event, k)
+        for i in range(start, len(lst)):
+            uid = lst[i].user_id
+            if uid is not None:  # VIP rows are reserved by name only
+                index[uid] = (k, i)
+
+
+def format_roster(event: EventState) -> str:
+    # Names and title are escaped once when stored, not on every render.
+    title_html = event.title_html or "Upcoming Game"
+    cap = event.capacity
+    players = event.players
+    wait = event.waitlist
     wait_cap = WAITLIST_CAPACITY
 
     lines = [
-        f"<b>⚽ {html.escape(title)}</b>",
+        f"<b>⚽ {title_html}</b>",
         f"Slots: <b>{len(players)}/{cap}</b>  •  Waitlist: <b>{len(wait)}/{wait_cap}</b>",
         "",
         "<b>Confirmed</b>",
@@ -129,35 +288,70 @@ def format_roster(event: Dict[str, Any]) -> str:
 
     if players:
         for i, p in enumerate(players, start=1):
-            tag = " (VIP)" if p.get("is_vip") else ""
-            lines.append(f"{i:>2}. {html.escape(p['name'])}{tag}")
+            lines.append(f"{i:>2}. {p.name_html}{' (VIP)' if p.is_vip else ''}")
     else:
         lines.append("(no one yet)")
 
     if wait:
         lines.extend(["", "<b>Waitlist</b>"])
         for i, p in enumerate(wait, start=1):
-            lines.append(f"WL{i:>2}. {html.escape(p['name'])}")
+            lines.append(f"WL{i:>2}. {p.name_html}")
 
     return "\n".join(lines)
 
 
-def vip_rows(capacity: int) -> List[Dict[str, Any]]:
+# chat_id -> (event version, rendered roster HTML)
+_roster_cache: LRUCache[int, tuple[int, str]] = LRUCache(maxsize=CHAT_CACHE_SIZE)
+
+
+def cached_roster(chat_id: int, event: EventState) -> str:
+    """Return format_roster(event), re-rendering only when the event version changed."""
+    version = event.version
+    hit = _roster_cache.get(chat_id)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    roster = format_roster(event)
+    _roster_cache[chat_id] = (version, roster)
+    return roster
+
+
+# VIP_NAMES is constant, so the reserved rows are built once at import time.
+_STARTUP_TS = now_ts()
+_VIP_NAMES_ESCAPED = [html.escape(n) for n in VIP_NAMES]
+_VIP_TEMPLATE: List[PlayerRow] = [
+    # user_id None means it's a reserved slot by name; we tag as VIP.
+    PlayerRow(user_id=None, name=nm, joined_at=_STARTUP_TS, is_vip=True, name_html=nm_html)
+    for nm, nm_html in zip(VIP_NAMES, _VIP_NAMES_ESCAPED)
+]
+_VIP_NAME_SET = frozenset(n.strip().lower() for n in VIP_NAMES if n.strip())
+
+
+def vip_rows(capacity: int) -> List[PlayerRow]:
     """Return reserved entries for VIP_NAMES (up to capacity)."""
-    rows = []
-    for nm in VIP_NAMES:
-        if len(rows) >= capacity:
-            break
-        rows.append(
-            {
-                # user_id None means it's a reserved slot by name; we tag as VIP.
-                "user_id": None,
-                "name": nm,
-                "joined_at": now_iso(),
-                "is_vip": True,
-            }
-        )
-    return rows
+    return [copy.copy(r) for r in _VIP_TEMPLATE[:capacity]]
+
+
+# dateutil only finds a date in a title that has a digit or a weekday/month name
+# ("Saturday", "Sat 5 Oct"). Anything else ("Kickabout at the park") would just
+# raise from the slow fuzzy parse, so skip it.
+_DATE_HINT = re.compile(
+    r"\d|\b(?:mon|tue|wed|thu|fri|sat|sun|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)",
+    re.IGNORECASE,
+)
+
+
+def parse_game_date(text: str) -> Optional[datetime]:
+    if not _DATE_HINT.search(text):
+        return None
+    try:
+        # Cheap exact path for ISO input such as "2024-10-05 19:00".
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return dtparser.parse(text, fuzzy=True)
+    except Exception:
+        return None
 
 
 # -----------------------------
@@ -171,11 +365,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "- /join — claim a slot\n"
         "- /leave — give up your slot\n"
         "- /list — show roster\n\n"
-        "Admins: /newgame, /lock, /unlock, /reset\n"
+        "Admins: /newgame, /lock, /unlock, /reset, /flush\n"
+        "New admin? Use /refreshadmins\n"
         f"Capacity defaults to {DEFAULT_CAPACITY}. Waitlist up to {WAITLIST_CAPACITY}."
     )
     await update.effective_message.reply_html(
-        text, reply_markup=make_keyboard(event.get("locked", False))
+        text, reply_markup=make_keyboard(event.locked)
     )
 
 
@@ -188,8 +383,8 @@ async def newgame(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     args = context.args
 
     event = ensure_event(context.chat_data)
-    capacity = event.get("capacity", DEFAULT_CAPACITY)
-    title = event.get("title") or "Next Game"
+    capacity = event.capacity
+    title = event.title or "Next Game"
 
     if args:
         # Try to parse last token as capacity if it's an int
@@ -202,25 +397,26 @@ async def newgame(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         # Remaining args form the title if present
         if args:
             title = " ".join(args).strip().strip('"')
-            try:
-                dt = dtparser.parse(title, fuzzy=True)
+            dt = parse_game_date(title)
+            if dt is not None:
                 title = dt.strftime("%a %d %b, %I:%M %p").lstrip("0")
-            except Exception:
-                pass
 
-    # Reset event and seed VIPs
+    # Reset event and seed VIPs. The version carries on from the previous event
+    # so a cached roster of the old game is never served for the new one.
     seeded = vip_rows(max(1, capacity))
-    context.chat_data["event"] = {
-        "title": title,
-        "capacity": max(1, capacity),
-        "locked": False,
-        "players": seeded[:capacity],  # VIPs occupy earliest slots
-        "waitlist": [],
-        "created_at": now_iso(),
-    }
+    title_html = html.escape(title)
+    context.chat_data["event"] = EventState(
+        title=title,
+        title_html=title_html,
+        capacity=max(1, capacity),
+        locked=False,
+        players=seeded[:capacity],  # VIPs occupy earliest slots
+        # VIP rows carry no user_id, so the index starts empty.
+        version=event.version + 1,
+    )
 
     msg = (
-        f"Created new game: <b>{html.escape(title)}</b>\n"
+        f"Created new game: <b>{title_html}</b>\n"
         f"Capacity: <b>{capacity}</b>\n"
         "VIPs auto-added. Tap <b>Join</b> to claim a spot!"
     )
@@ -237,10 +433,12 @@ async def leave_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def list_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     event = ensure_event(context.chat_data)
-    roster = format_roster(event)
-    await update.effective_message.reply_html(
-        roster, reply_markup=make_keyboard(event.get("locked", False))
+    version = event.version
+    roster = cached_roster(update.effective_chat.id, event)
+    sent = await update.effective_message.reply_html(
+        roster, reply_markup=make_keyboard(event.locked)
     )
+    remember_roster(context, update.effective_chat.id, event, sent.message_id, version)
 
 
 async def lock_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -248,7 +446,10 @@ async def lock_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.effective_message.reply_text("Only admins can lock the list.")
         return
     event = ensure_event(context.chat_data)
-    event["locked"] = True
+    event.locked = True
+    bump_version(event)
+    # The roster message's Join button must turn into "🔒 Locked".
+    schedule_roster_refresh(context, update.effective_chat.id)
     await update.effective_message.reply_text("Sign-ups locked. 🧱")
 
 
@@ -257,51 +458,168 @@ async def unlock_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         await update.effective_message.reply_text("Only admins can unlock the list.")
         return
     event = ensure_event(context.chat_data)
-    event["locked"] = False
+    event.locked = False
+    bump_version(event)
+    schedule_roster_refresh(context, update.effective_chat.id)
     await update.effective_message.reply_text("Sign-ups unlocked. ✅")
 
 
+async def refreshadmins_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # Open to everyone: a newly promoted admin is still cached as non-admin.
+    forget_admins(update.effective_chat.id)
+    await update.effective_message.reply_text("Admin list refreshed.")
+
+
 async def reset_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not await user_is_admin(update, context):
         await update.effective_message.reply_text("Only admins can reset.")
         return
-    context.chat_data.pop("event", None)
-    event = ensure_event(context.chat_data)
+    old = ensure_event(context.chat_data)
+    event = context.chat_data["event"] = EventState(version=old.version + 1)
+    forget_chat(update.effective_chat.id)
     await update.effective_message.reply_text(
-        "Event reset.", reply_markup=make_keyboard(event.get("locked", False))
+        "Event reset.", reply_markup=make_keyboard(event.locked)
     )
 
 
 # -----------------------------
 # Callback (Buttons)
 # -----------------------------
+def remember_roster(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    event: EventState,
+    message_id: int,
+    version: int,
+) -> None:
+    """Record that `message_id` shows the roster as rendered at `version`."""
+    event.roster_msg_id = message_id
+    event.roster_msg_version = version
+    if event.version != version:
+        # Something changed while the message was being sent.
+        schedule_roster_refresh(context, chat_id)
+
+
 async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
-
     data = query.data
+
+    if data == "noop":
+        # "🔒 Locked" button: nothing to do, let the client cache the answer.
+        await query.answer("Sign-ups locked", cache_time=30)
+        return
+    if data == "list":
+        await show_roster_from_button(update, context)
+        return
+
+    await query.answer()
     if data == "join":
         await handle_join(update, context, source="button")
     elif data == "leave":
         await handle_leave(update, context, source="button")
-    elif data == "list":
-        event = ensure_event(context.chat_data)
-        await query.message.reply_html(
-            format_roster(event), reply_markup=make_keyboard(event.get("locked", False))
+
+
+async def show_roster_from_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    event = ensure_event(context.chat_data)
+
+    if query.message.message_id != event.roster_msg_id:
+        # Pressed under some other bot message: post a fresh roster.
+        await query.answer()
+        version = event.version
+        roster = cached_roster(update.effective_chat.id, event)
+        sent = await query.message.reply_html(
+            roster, reply_markup=make_keyboard(event.locked)
         )
-    else:
-        pass
+        remember_roster(context, update.effective_chat.id, event, sent.message_id, version)
+        return
+
+    if event.roster_msg_version == event.version:
+        # The message already shows the current roster; only answer the query.
+        await query.answer("Roster is up to date.")
+        return
+
+    # Pressed under our own roster: update it in place instead of replying.
+    await query.answer()
+    await edit_roster(context, update.effective_chat.id, event)
+
+
+async def edit_roster(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: EventState) -> None:
+    """Re-render the roster message recorded on the event with the current state."""
+    version = event.version
+    try:
+        await context.bot.edit_message_text(
+            cached_roster(chat_id, event),
+            chat_id=chat_id,
+            message_id=event.roster_msg_id,
+            parse_mode=ParseMode.HTML,
+            reply_markup=make_keyboard(event.locked),
+        )
+    except BadRequest as e:
+        # Changes that cancel out (join then leave) render the same text.
+        if "not modified" not in str(e).lower():
+            raise
+    # The event may have changed while we awaited; record what was rendered.
+    event.roster_msg_version = version
+
+
+# chat_id -> pending roster refresh
+_pending_render: Dict[int, asyncio.Task] = {}
+
+
+def schedule_roster_refresh(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> None:
+    if chat_id not in _pending_render:
+        _pending_render[chat_id] = context.application.create_task(
+            _delayed_render(context, chat_id, ROSTER_DEBOUNCE)
+        )
+
+
+async def _delayed_render(context: ContextTypes.DEFAULT_TYPE, chat_id: int, delay: float) -> None:
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        # Changes from here on schedule a fresh refresh.
+        _pending_render.pop(chat_id, None)
+
+    event = ensure_event(context.chat_data)
+    if event.roster_msg_id is None or event.roster_msg_version == event.version:
+        return
+    try:
+        await edit_roster(context, chat_id, event)
+    except BadRequest as e:
+        # Typically the roster message was deleted; stop tracking it.
+        logger.info("Could not refresh roster in chat %s: %s", chat_id, e)
+        event.roster_msg_id = None
 
 
 # -----------------------------
 # Core Join/Leave Logic
 # -----------------------------
-def _vip_name_set() -> set[str]:
-    return {n.strip().lower() for n in VIP_NAMES if n.strip()}
+def _vip_name_set() -> frozenset[str]:
+    return _VIP_NAME_SET
+
+
+def _is_vip_row(row: PlayerRow) -> bool:
+    return row.is_vip
+
+
+# Updates are processed concurrently; a lock per chat keeps each roster's
+# check-then-append atomic without serializing unrelated chats. Bounded so
+# chats the bot has long stopped hearing from don't pin memory.
+_chat_locks: LRUCache[int, asyncio.Lock] = LRUCache(maxsize=CHAT_CACHE_SIZE)
+
 
+def _get_lock(chat_id: int) -> asyncio.Lock:
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = _chat_locks[chat_id] = asyncio.Lock()
+    return lock
 
-def _is_vip_row(row: Dict[str, Any]) -> bool:
-    return bool(row.get("is_vip"))
+
+def forget_chat(chat_id: int) -> None:
+    """Drop the in-memory per-chat caches for chat_id."""
+    _chat_locks.pop(chat_id, None)
+    _roster_cache.pop(chat_id, None)
 
 
 async def handle_join(update: Update, context: ContextTypes.DEFAULT_TYPE, source: str) -> None:
@@ -309,36 +627,290 @@ async def handle_join(update: Update, context: ContextTypes.DEFAULT_TYPE, source
     msg = update.effective_message
     user = update.effective_user
 
-    if event.get("locked"):
+    if event.locked:
         await msg.reply_text("Sign-ups are locked.")
         return
 
     uid = user.id
     display_name = user.full_name
 
-    # Already in players?
-    i = find_user(event["players"], uid)
-    if i != -1:
-        await msg.reply_text(f"You're already in the list at #{i+1}.")
-        return
+    async with _get_lock(update.effective_chat.id):
+        version = event.version
+        reply = _join(event, uid, display_name)
+    await msg.reply_text(reply)
+    if event.version != version:
+        schedule_roster_refresh(context, update.effective_chat.id)
+
+
+def _join(event: EventState, uid: int, display_name: str) -> str:
+    """Add uid to the event and return the reply text. Caller holds the chat lock."""
+    # Already in players or waitlist?
+    found = event.index.get(uid)
+    if found is not None:
+        where, pos = found
+        if where == "players":
+            return f"You're already in the list at #{pos+1}."
+        return f"You're already on the waitlist at WL#{pos+1}."
+
+    players = event.players
+    waitlist = event.waitlist
+    entry = PlayerRow(
+        user_id=uid,
+        name=display_name,
+        joined_at=now_ts(),
+        name_html=html.escape(display_name),
+    )
+
+    if len(players) < event.capacity:
+        players.append(entry)
+        event.index[uid] = ("players", len(players) - 1)
+        bump_version(event)
+        return f"Joined! You are #{len(players)}."
+
+    # Enforce waitlist capacity (a full deque would silently drop WL#1 instead)
+    if len(waitlist) == waitlist.maxlen:
+        return "List and waitlist are full. Sorry!"
+    waitlist.append(entry)
+    event.index[uid] = ("waitlist", len(waitlist) - 1)
+    bump_version(event)
+    return f"List is full. You are WL#{len(waitlist)}."
+
+
+async def handle_leave(update: Update, context: ContextTypes.DEFAULT_TYPE, source: str) -> None:
+    event = ensure_event(context.chat_data)
+    msg = update.effective_message
+    uid = update.effective_user.id
+
+    async with _get_lock(update.effective_chat.id):
+        version = event.version
+        reply = _leave(event, uid)
+    await msg.reply_html(reply)
+    if event.version != version:
+        schedule_roster_refresh(context, update.effective_chat.id)
+
+
+def _leave(event: EventState, uid: int) -> str:
+    """Remove uid from the event and return the reply HTML. Caller holds the chat lock."""
+    found = event.index.pop(uid, None)
+    if found is None:
+        return "You're not on the list."
+
+    where, pos = found
+    del getattr(event, where)[pos]
+    # Everyone behind the leaver moved up one position.
+    rebuild_index(event, where, pos)
+    bump_version(event)
+
+    if where == "waitlist":
+        return "You left the waitlist."
+
+    players = event.players
+    waitlist = event.waitlist
+    if not waitlist or len(players) >= event.capacity:
+        return "You left the list."
+
+    # A slot opened up: WL#1 takes it, and everyone on the waitlist moves up.
+    promoted = waitlist.popleft()
+    players.append(promoted)
+    rebuild_index(event, "players", len(players) - 1)
+    rebuild_index(event, "waitlist")
+    mention = f'<a href="tg://user?id={promoted.user_id}">{promoted.name_html}</a>'
+    return f"You left the list. {mention} moved up from the waitlist to #{len(players)}."
+
+
+# -----------------------------
+# Persistence
+# -----------------------------
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, EventState):
+        # The index is derived data; EventState.from_dict rebuilds it on load.
+        return {f: getattr(obj, f) for f in _EVENT_JSON_FIELDS}
+    if isinstance(obj, PlayerRow):
+        return {f: getattr(obj, f) for f in _ROW_JSON_FIELDS}
+    if isinstance(obj, deque):
+        return list(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+_EVENT_JSON_FIELDS = [f for f in EventState.__slots__ if f != "index"]
+_ROW_JSON_FIELDS = list(PlayerRow.__slots__)
+_JSON_OPTS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+class CompactPersistence(BasePersistence):
+    """Keeps chat_data in memory and stores it as zlib-compressed JSON.
+
+    Only chat_data is persisted. Events are written as plain dicts and turned back
+    into EventState lazily by ensure_event, like any other legacy dict event.
+    """
+
+    def __init__(self, filepath: str, update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=True, user_data=False, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self.filepath = Path(filepath)
+        self._chat_data: Optional[Dict[int, Dict[str, Any]]] = None
+        self._dirty = False
+        self._write_task: Optional[asyncio.Task] = None
+
+    def _load(self) -> Dict[int, Dict[str, Any]]:
+        if self.filepath.exists():
+            data = orjson.loads(zlib.decompress(self.filepath.read_bytes()))
+            return {int(chat_id): chat_data for chat_id, chat_data in data.items()}
+        legacy = Path(LEGACY_PICKLE_FILE)
+        if legacy.exists():
+            logger.info("Importing chat_data from %s", legacy)
+            with legacy.open("rb") as f:
+                return pickle.load(f).get("chat_data") or {}
+        return {}
+
+    def _dump(self) -> None:
+        self._dirty = False
+        raw = orjson.dumps(self._chat_data, default=_json_default, option=_JSON_OPTS)
+        tmp = self.filepath.with_suffix(self.filepath.suffix + ".tmp")
+        tmp.write_bytes(zlib.compress(raw, 1))
+        tmp.replace(self.filepath)
+
+    def _mark_dirty(self) -> None:
+        # The application updates every changed chat in one batch; write once
+        # after the whole batch rather than once per chat.
+        self._dirty = True
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.get_running_loop().create_task(self._write_later())
+
+    async def _write_later(self) -> None:
+        if self._dirty:
+            self._dump()
+
+    async def get_chat_data(self) -> Dict[int, Dict[str, Any]]:
+        if self._chat_data is None:
+            self._chat_data = self._load()
+        # Hand out a copy: update_chat_data compares against our snapshot, which
+        # must not be the very dicts the application goes on to mutate.
+        return copy.deepcopy(self._chat_data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[str, Any]) -> None:
+        if self._chat_data is None:
+            self._chat_data = {}
+        if self._chat_data.get(chat_id) == data:
+            return
+        self._chat_data[chat_id] = data
+        self._mark_dirty()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        forget_chat(chat_id)
+        if self._chat_data is None or self._chat_data.pop(chat_id, None) is None:
+            return
+        self._mark_dirty()
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[str, Any]) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._write_task is not None:
+            await self._write_task
+        if self._dirty:
+            self._dump()
+
+    # Nothing but chat_data is stored.
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Any, Any]:
+        return {}
+
+    async def update_conversation(self, name: str, key: Any, new_state: Optional[object]) -> None:
+        pass
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
 
-    # Already in waitlist?
-    j = find_user(event["waitlist"], uid)
-    if j != -1:
-        await msg.reply_text(f"You're already on the waitlist at WL#{j+1}.")
+
+async def flush_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not await user_is_admin(update, context):
+        await update.effective_message.reply_text("Only admins can flush.")
         return
+    # chat_data only reaches the persistence object on the periodic update job,
+    # so push the current state first, then write it out.
+    await context.application.update_persistence()
+    await context.application.persistence.flush()
+    await update.effective_message.reply_text("State saved to disk. 💾")
 
-    capacity = event.get("capacity", DEFAULT_CAPACITY)
 
-    entry = {"user_id": uid, "name": display_name, "joined_at": now_iso(), "is_vip": False}
+# -----------------------------
+# Main
+# -----------------------------
+def main() -> None:
+    token = os.environ["BOT_TOKEN"]
+
+    # Keep chat_data in memory and write the file every PERSISTENCE_INTERVAL
+    # seconds (and on shutdown) instead of on every Join/Leave.
+    persistence = CompactPersistence(PERSISTENCE_FILE, update_interval=PERSISTENCE_INTERVAL)
+    app = (
+        Application.builder()
+        .token(token)
+        .persistence(persistence)
+        .concurrent_updates(True)
+        .build()
+    )
 
-    if len(event["players"]) < capacity:
-        event["players"].append(entry)
-        await msg.reply_text(f"Joined! You are #{len(event['players'])}.")
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("newgame", newgame))
+    app.add_handler(CommandHandler("join", join_cmd))
+    app.add_handler(CommandHandler("leave", leave_cmd))
+    app.add_handler(CommandHandler("list", list_cmd))
+    app.add_handler(CommandHandler("lock", lock_cmd))
+    app.add_handler(CommandHandler("unlock", unlock_cmd))
+    app.add_handler(CommandHandler("reset", reset_cmd))
+    app.add_handler(CommandHandler("flush", flush_cmd))
+    app.add_handler(CommandHandler("refreshadmins", refreshadmins_cmd))
+    app.add_handler(CallbackQueryHandler(on_button))
+
+    # Webhook: Telegram pushes updates to us instead of waiting on getUpdates
+    # round-trips. WEBHOOK_URL is the public base URL (e.g. "https://bot.example.com");
+    # PORT is where the local server listens (set by most PaaS hosts). Run it as
+    # the Procfile's `web` process; `worker` gets no inbound traffic. Scale only
+    # one of the two: polling fails while a webhook is registered.
+    webhook_url = os.environ.get("WEBHOOK_URL")
+    if webhook_url:
+        # Telegram echoes this in a header on every push; PTB rejects requests
+        # without it. A fresh one per start is fine as run_webhook re-registers.
+        secret = os.environ.get("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=int(os.environ.get("PORT", "8443")),
+            url_path=token,
+            webhook_url=f"{webhook_url.rstrip('/')}/{token}",
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES,
+        )
     else:
-        # Enforce waitlist capacity
-        if len(event["waitlist"]) >= WAITLIST_CAPACITY:
-            await msg.reply_text("List and waitlist are full. Sorry!")
-            return
-        event["waitlist"].append(entry)
-        await msg.reply_text(f"List is full. You are WL#{len(event['waitlist'])}.")
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
+
+
+if __name__ == "__main__":
+    main()
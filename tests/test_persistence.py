@@ -0,0 +1,31 @@
+import asyncio
+
+import main
+
+
+def test_compact_persistence_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run() -> None:
+        # Run 1: one user joins and the state is flushed.
+        p1 = main.CompactPersistence("bot.json.zlib")
+        chat_data = await p1.get_chat_data()
+        chat_data[1] = {}
+        main._join(main.ensure_event(chat_data[1]), 10, "Alice")
+        await p1.update_chat_data(1, chat_data[1])
+        await p1.flush()
+
+        # Run 2: load, mutate the loaded data, update and flush again.
+        p2 = main.CompactPersistence("bot.json.zlib")
+        chat_data = await p2.get_chat_data()
+        main._join(main.ensure_event(chat_data[1]), 20, "Bob")
+        await p2.update_chat_data(1, chat_data[1])
+        await p2.flush()
+
+        # Run 3: both joins survived.
+        p3 = main.CompactPersistence("bot.json.zlib")
+        event = main.ensure_event((await p3.get_chat_data())[1])
+        assert [p.name for p in event.players] == ["Alice", "Bob"]
+        assert event.index == {10: ("players", 0), 20: ("players", 1)}
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import main
+
+
+def test_leave_promotes_first_waitlisted_player():
+    event = main.EventState(capacity=2)
+    main._join(event, 1, "a")
+    main._join(event, 2, "b")
+    assert main._join(event, 3, "wl-c") == "List is full. You are WL#1."
+    main._join(event, 4, "wl-e")
+
+    reply = main._leave(event, 1)
+    assert "moved up from the waitlist to #2" in reply
+    assert [p.name for p in event.players] == ["b", "wl-c"]
+    assert event.index == {2: ("players", 0), 3: ("players", 1), 4: ("waitlist", 0)}
+
+    assert main._join(event, 5, "d") == "List is full. You are WL#2."
+
+
+def test_leave_from_waitlist_does_not_promote():
+    event = main.EventState(capacity=1)
+    main._join(event, 1, "a")
+    main._join(event, 2, "b")
+    main._join(event, 3, "c")
+
+    assert main._leave(event, 2) == "You left the waitlist."
+    assert event.index == {1: ("players", 0), 3: ("waitlist", 0)}
+
+
+def test_list_records_rendered_version_when_state_changes_mid_send(monkeypatch):
+    chat_data = {}
+    event = main.ensure_event(chat_data)
+    scheduled = []
+    monkeypatch.setattr(main, "schedule_roster_refresh", lambda ctx, chat_id: scheduled.append(chat_id))
+
+    async def reply_html(text, reply_markup=None):
+        main._join(event, 9, "late")  # a join lands while the roster is being sent
+        return SimpleNamespace(message_id=77)
+
+    update = SimpleNamespace(
+        effective_chat=SimpleNamespace(id=1),
+        effective_message=SimpleNamespace(reply_html=reply_html),
+    )
+    asyncio.run(main.list_cmd(update, SimpleNamespace(chat_data=chat_data)))
+
+    assert (event.roster_msg_id, event.roster_msg_version, event.version) == (77, 0, 1)
+    assert scheduled == [1]
+
+
+def test_parse_game_date_keeps_weekday_titles_and_skips_free_text():
+    assert main.parse_game_date("Saturday") is not None
+    assert main.parse_game_date("Friday night kickabout") is not None
+    assert main.parse_game_date("2024-10-05 19:00").hour == 19
+    assert main.parse_game_date("Kickabout at the park") is None